@@ -1,171 +1,357 @@
 """Dataclasses for elements of a TMDB record
 
-Defines objects for parts of a TMDB record and provides insert statements for Postgres
+Defines objects for parts of a TMDB record and provides parameterized insert statements for Postgres
 
 """
+import sys
 from dataclasses import dataclass
-from typing import List
+from typing import ClassVar, Tuple
 
+from .Parsing import intern_string
 
-@dataclass
+
+@dataclass(slots=True)
 class Collection:
     id: int  #: Collection id
     name: str  #: Collection name
     poster_path: str  #: Link to collection poster
     backdrop_path: str  #: Link to collection backdrop path
-    table_name: str = 'tmdb_collection'  #: Default name of Postgres table to store Collection in
+    table_name: ClassVar[str] = 'tmdb_collection'  #: Name of Postgres table to store Collection in
+    columns: ClassVar[Tuple[str, ...]] = ('id', 'name', 'poster_path', 'backdrop_path')  #: Postgres columns in table order
+    _INSERT_SQL: ClassVar[str] = "INSERT INTO tmdb_collection VALUES(%s, %s, %s, %s) ON CONFLICT (id) DO NOTHING"
+
+    @classmethod
+    def from_row(cls, row: dict) -> 'Collection':
+        """Creates a Collection from an object of a raw record
+
+        Args:
+            row: Collection object of a raw record
+
+        Returns:
+            A Collection object
+        """
+        return cls(row['id'], row['name'], row['poster_path'], row['backdrop_path'])
 
-    def get_insert_statement(self) -> str:
+    def get_insert_statement(self) -> Tuple[str, tuple]:
         """Generates an insert statement for the Collection object
 
         Returns:
-            Collection insert string
+            Collection insert string and its parameters
         """
-        return (f"INSERT INTO {self.table_name} VALUES({self.id}, "
-                f"$${self.name}$$, "
-                f"$${self.poster_path}$$, "
-                f"$${self.backdrop_path}$$) ON CONFLICT (id) DO NOTHING")
+        return self._INSERT_SQL, self.as_row_tuple()
 
+    def as_row_tuple(self) -> tuple:
+        """Gets the column values of the Collection object, in the order of ``columns``
 
-@dataclass
+        Returns:
+            Collection row tuple
+        """
+        return (self.id, self.name, self.poster_path, self.backdrop_path)
+
+
+@dataclass(slots=True)
 class Genre:
     id: int  #: Genre id
     name: str  #: Genre name
-    table_name: str = 'tmdb_genres'  #: Default name of Postgres table to store Genre in
+    table_name: ClassVar[str] = 'tmdb_genres'  #: Name of Postgres table to store Genre in
+    columns: ClassVar[Tuple[str, ...]] = ('id', 'name')  #: Postgres columns in table order
+    _INSERT_SQL: ClassVar[str] = "INSERT INTO tmdb_genres VALUES(%s, %s) ON CONFLICT (id) DO NOTHING"
+
+    @classmethod
+    def from_row(cls, row: dict) -> 'Genre':
+        """Creates a Genre from an object of a raw record
 
-    def get_insert_statement(self) -> str:
+        Args:
+            row: Genre object of a raw record
+
+        Returns:
+            A Genre object
+        """
+        return cls(row['id'], row['name'])
+
+    def get_insert_statement(self) -> Tuple[str, tuple]:
         """Generates an insert statement for the Genre object
 
             Returns:
-                Genre insert string
+                Genre insert string and its parameters
             """
-        return (f"INSERT INTO {self.table_name} VALUES({self.id}, "
-                f"$${self.name}$$) ON CONFLICT (id) DO NOTHING")
+        return self._INSERT_SQL, self.as_row_tuple()
+
+    def as_row_tuple(self) -> tuple:
+        """Gets the column values of the Genre object, in the order of ``columns``
+
+        Returns:
+            Genre row tuple
+        """
+        return (self.id, self.name)
 
 
-@dataclass
+@dataclass(slots=True)
 class ProductionCompany:
     id: int  #: ProductionCompany id
     name: str  #: ProductionCompany name
-    table_name: str = 'tmdb_production_companies'  #: Default name of Postgres table to store ProductionCompany in
+    table_name: ClassVar[str] = 'tmdb_production_companies'  #: Name of Postgres table to store ProductionCompany in
+    columns: ClassVar[Tuple[str, ...]] = ('id', 'name')  #: Postgres columns in table order
+    _INSERT_SQL: ClassVar[str] = "INSERT INTO tmdb_production_companies VALUES(%s, %s) ON CONFLICT (id) DO NOTHING"
+
+    @classmethod
+    def from_row(cls, row: dict) -> 'ProductionCompany':
+        """Creates a ProductionCompany from an object of a raw record
+
+        Args:
+            row: ProductionCompany object of a raw record
 
-    def get_insert_statement(self) -> str:
+        Returns:
+            A ProductionCompany object
+        """
+        return cls(row['id'], row['name'])
+
+    def get_insert_statement(self) -> Tuple[str, tuple]:
         """Generates an insert statement for the ProductionCompany object
 
         Returns:
-            ProductionCompany insert string
+            ProductionCompany insert string and its parameters
+        """
+        return self._INSERT_SQL, self.as_row_tuple()
+
+    def as_row_tuple(self) -> tuple:
+        """Gets the column values of the ProductionCompany object, in the order of ``columns``
+
+        Returns:
+            ProductionCompany row tuple
         """
-        return (f"INSERT INTO {self.table_name} VALUES({self.id}, "
-                f"$${self.name}$$) ON CONFLICT (id) DO NOTHING")
+        return (self.id, self.name)
 
 
-@dataclass
+@dataclass(slots=True)
 class Country:
     iso_3166_1: str  #: Country iso 3166-1 code
     name: str  #: Name of Country
-    table_name: str = 'tmdb_countries'  #: Default name of Postgres table to store Country in
+    table_name: ClassVar[str] = 'tmdb_countries'  #: Name of Postgres table to store Country in
+    columns: ClassVar[Tuple[str, ...]] = ('id', 'iso_3166_1', 'name')  #: Postgres columns in table order
+    key_column: ClassVar[str] = 'iso_3166_1'  #: Column holding the natural key used to look up the id
+    _INSERT_SQL: ClassVar[str] = "INSERT INTO tmdb_countries VALUES(%s, %s, %s) ON CONFLICT (id) DO NOTHING"
+    _INSERT_WITHOUT_ID_SQL: ClassVar[str] = ("INSERT INTO tmdb_countries(iso_3166_1, name) VALUES(%s, %s) "
+                                             "ON CONFLICT (id) DO NOTHING")
+    _ID_QUERY_SQL: ClassVar[str] = "SELECT id FROM tmdb_countries WHERE iso_3166_1=%s"
+    _INSERT_RETURNING_ID_SQL: ClassVar[str] = ("INSERT INTO tmdb_countries(iso_3166_1, name) VALUES(%s, %s) "
+                                               "ON CONFLICT (iso_3166_1) DO NOTHING RETURNING id")
     id: int = None  #: Country id
 
-    def get_insert_statement(self) -> str:
+    def __post_init__(self):
+        self.iso_3166_1 = intern_string(self.iso_3166_1)
+
+    @classmethod
+    def from_row(cls, row: dict) -> 'Country':
+        """Creates a Country from an object of a raw record
+
+        Args:
+            row: Country object of a raw record
+
+        Returns:
+            A Country object
+        """
+        return cls(row['iso_3166_1'], row['name'])
+
+    def get_insert_statement(self) -> Tuple[str, tuple]:
         """Generates an insert statement for the Country object
 
         Returns:
-            Country insert string
+            Country insert string and its parameters
         """
         if self.id is None:
-            return (f"INSERT INTO {self.table_name}(iso_3166_1, name) VALUES($${self.iso_3166_1}$$, "
-                    f"$${self.name}$$) ON CONFLICT (id) DO NOTHING")
+            return self._INSERT_WITHOUT_ID_SQL, (self.iso_3166_1, self.name)
         else:
-            return (f"INSERT INTO {self.table_name} VALUES({self.id}, "
-                    f"$${self.iso_3166_1}$$, "
-                    f"$${self.name}$$) ON CONFLICT (id) DO NOTHING")
+            return self._INSERT_SQL, self.as_row_tuple()
 
-    def get_id_query_statement(self) -> str:
+    def get_id_query_statement(self) -> Tuple[str, tuple]:
         """Generates a query statement for the Country object
 
         Returns:
-            Country query string
+            Country query string and its parameters
+        """
+        return self._ID_QUERY_SQL, (self.iso_3166_1,)
+
+    def get_insert_returning_id_statement(self) -> Tuple[str, tuple]:
+        """Generates an insert statement for the Country object that returns the new id
+
+        Nothing is returned if a Country with the same iso_3166_1 code already exists.
+
+        Returns:
+            Country insert string and its parameters
         """
-        return f"SELECT id FROM {self.table_name} WHERE iso_3166_1='{self.iso_3166_1}'"
+        return self._INSERT_RETURNING_ID_SQL, (self.iso_3166_1, self.name)
 
+    def as_row_tuple(self) -> tuple:
+        """Gets the column values of the Country object, in the order of ``columns``
 
-@dataclass
+        Returns:
+            Country row tuple
+        """
+        return (self.id, self.iso_3166_1, self.name)
+
+
+@dataclass(slots=True)
 class Language:
     iso_639_1: str  #: Language iso 639-1 code
     name: str  #: Name of Language
-    table_name: str = 'tmdb_languages'  #: Default name of Postgres table to store Language in
+    table_name: ClassVar[str] = 'tmdb_languages'  #: Name of Postgres table to store Language in
+    columns: ClassVar[Tuple[str, ...]] = ('id', 'iso_639_1', 'name')  #: Postgres columns in table order
+    key_column: ClassVar[str] = 'iso_639_1'  #: Column holding the natural key used to look up the id
+    _INSERT_SQL: ClassVar[str] = "INSERT INTO tmdb_languages VALUES(%s, %s, %s) ON CONFLICT (id) DO NOTHING"
+    _INSERT_WITHOUT_ID_SQL: ClassVar[str] = ("INSERT INTO tmdb_languages(iso_639_1, name) VALUES(%s, %s) "
+                                             "ON CONFLICT (id) DO NOTHING")
+    _ID_QUERY_SQL: ClassVar[str] = "SELECT id FROM tmdb_languages WHERE iso_639_1=%s"
+    _INSERT_RETURNING_ID_SQL: ClassVar[str] = ("INSERT INTO tmdb_languages(iso_639_1, name) VALUES(%s, %s) "
+                                               "ON CONFLICT (iso_639_1) DO NOTHING RETURNING id")
     id: int = None  #: Language id
 
-    def get_insert_statement(self) -> str:
+    def __post_init__(self):
+        self.iso_639_1 = intern_string(self.iso_639_1)
+
+    @classmethod
+    def from_row(cls, row: dict) -> 'Language':
+        """Creates a Language from an object of a raw record
+
+        Args:
+            row: Language object of a raw record
+
+        Returns:
+            A Language object
+        """
+        return cls(row['iso_639_1'], row['name'])
+
+    def get_insert_statement(self) -> Tuple[str, tuple]:
         """Generates an insert statement for the Language object
 
         Returns:
-            Language insert string
+            Language insert string and its parameters
         """
         if self.id is None:
-            return (f"INSERT INTO {self.table_name}(iso_639_1, name) VALUES($${self.iso_639_1}$$, "
-                    f"$${self.name}$$) ON CONFLICT (id) DO NOTHING")
+            return self._INSERT_WITHOUT_ID_SQL, (self.iso_639_1, self.name)
         else:
-            return (f"INSERT INTO {self.table_name} VALUES({self.id}, "
-                    f"$${self.iso_639_1}$$, "
-                    f"$${self.name}$$) ON CONFLICT (id) DO NOTHING")
+            return self._INSERT_SQL, self.as_row_tuple()
 
-    def get_id_query_statement(self) -> str:
+    def get_id_query_statement(self) -> Tuple[str, tuple]:
         """Generates a query statement for the Language object
 
         Returns:
-            Language query string
+            Language query string and its parameters
+        """
+        return self._ID_QUERY_SQL, (self.iso_639_1,)
+
+    def get_insert_returning_id_statement(self) -> Tuple[str, tuple]:
+        """Generates an insert statement for the Language object that returns the new id
+
+        Nothing is returned if a Language with the same iso_639_1 code already exists.
+
+        Returns:
+            Language insert string and its parameters
+        """
+        return self._INSERT_RETURNING_ID_SQL, (self.iso_639_1, self.name)
+
+    def as_row_tuple(self) -> tuple:
+        """Gets the column values of the Language object, in the order of ``columns``
+
+        Returns:
+            Language row tuple
         """
-        return f"SELECT id FROM {self.table_name} WHERE iso_639_1='{self.iso_639_1}'"
+        return (self.id, self.iso_639_1, self.name)
 
 
-@dataclass
+@dataclass(slots=True)
 class Keyword:
     id: int  #: Keyword id
     name: str  #: Keyword
-    table_name: str = 'tmdb_keywords'  #: Default name of Postgres table to store Keyword in
+    table_name: ClassVar[str] = 'tmdb_keywords'  #: Name of Postgres table to store Keyword in
+    columns: ClassVar[Tuple[str, ...]] = ('id', 'name')  #: Postgres columns in table order
+    _INSERT_SQL: ClassVar[str] = "INSERT INTO tmdb_keywords VALUES(%s, %s) ON CONFLICT (id) DO NOTHING"
+
+    @classmethod
+    def from_row(cls, row: dict) -> 'Keyword':
+        """Creates a Keyword from an object of a raw record
+
+        Args:
+            row: Keyword object of a raw record
+
+        Returns:
+            A Keyword object
+        """
+        return cls(row['id'], row['name'])
 
-    def get_insert_statement(self) -> str:
+    def get_insert_statement(self) -> Tuple[str, tuple]:
         """Generates an insert statement for the Keyword object
 
         Returns:
-            Keyword insert string
+            Keyword insert string and its parameters
+        """
+        return self._INSERT_SQL, self.as_row_tuple()
+
+    def as_row_tuple(self) -> tuple:
+        """Gets the column values of the Keyword object, in the order of ``columns``
+
+        Returns:
+            Keyword row tuple
         """
-        return (f"INSERT INTO {self.table_name} VALUES({self.id}, "
-                f"$${self.name}$$) ON CONFLICT (id) DO NOTHING")
+        return (self.id, self.name)
 
 
-@dataclass
+@dataclass(slots=True)
 class Cast:
     id: int  #: Cast id
     movie_id: int  #: Related Movie id
     cast_id: int  #: TMDB cast id
     credit_id: str  #: TMDB credit id
-    character: str  #: Character name
+    characters: Tuple[str, ...]  #: Character names, split out of the raw '/'-separated character string
     gender: int  #: Gender code
     name: str  #: Name of cast member
     order: int  #: Order appearing in credits
     profile_path: str  #: Path to TMDB profile
-    table_name: str = 'tmdb_cast'  #: Default name of Postgres table to store Cast in
+    table_name: ClassVar[str] = 'tmdb_cast'  #: Name of Postgres table to store Cast in
+    columns: ClassVar[Tuple[str, ...]] = ('id', 'movie_id', 'cast_id', 'credit_id', 'character', 'gender', 'name',
+                                          '"order"', 'profile_path')  #: Postgres columns in table order
+    column_types: ClassVar[Tuple[str, ...]] = ('integer', 'integer', 'integer', 'varchar', 'varchar[]', 'int', 'varchar',
+                                               'integer', 'varchar')  #: Postgres types of the columns, for binary COPY
+    _INSERT_SQL: ClassVar[str] = ("INSERT INTO tmdb_cast VALUES(%s, %s, %s, %s, %s, %s, %s, %s, %s) "
+                                  "ON CONFLICT (id) DO NOTHING")
+
+    def __post_init__(self):
+        if isinstance(self.characters, str):
+            self.characters = tuple(sys.intern(name.strip()) for name in self.characters.split('/'))
+
+    @classmethod
+    def from_row(cls, row: dict, movie_id: int) -> 'Cast':
+        """Creates a Cast from an object of a raw record
+
+        Args:
+            row: Cast object of a raw record
+            movie_id: Id of the Movie the Cast belongs to
 
-    def get_insert_statement(self) -> str:
+        Returns:
+            A Cast object
+        """
+        return cls(row['id'], movie_id, row['cast_id'], row['credit_id'], row['character'], row['gender'], row['name'],
+                   row['order'], row['profile_path'])
+
+    def get_insert_statement(self) -> Tuple[str, tuple]:
         """Generates an insert statement for the Cast object
 
         Returns:
-            Cast insert string
+            Cast insert string and its parameters
+        """
+        return self._INSERT_SQL, self.as_row_tuple()
+
+    def as_row_tuple(self) -> tuple:
+        """Gets the column values of the Cast object, in the order of ``columns``
+
+        Returns:
+            Cast row tuple
         """
-        return (f"INSERT INTO {self.table_name} VALUES({self.id}, "
-                f"{self.movie_id}, "
-                f"{self.cast_id}, "
-                f"$${self.credit_id}$$, "
-                f"ARRAY[$${'$$, $$'.join([x.lstrip() for x in self.character.split('/')])}$$], "
-                f"{self.gender}, "
-                f"$${self.name}$$, "
-                f"{self.order}, "
-                f"$${self.profile_path}$$) ON CONFLICT (id) DO NOTHING")
+        return (self.id, self.movie_id, self.cast_id, self.credit_id, list(self.characters), self.gender, self.name,
+                self.order, self.profile_path)
 
 
-@dataclass
+@dataclass(slots=True)
 class Crew:
     id: int  #: Crew id
     movie_id: int  #: Related Movie id
@@ -175,19 +361,45 @@ class Crew:
     job: str  #: Job crew member performed
     name: str  #: Name of crew member
     profile_path: str  #: Path to TMDB profile
-    table_name: str = 'tmdb_crew'  #: Default name of Postgres table to store Crew in
+    table_name: ClassVar[str] = 'tmdb_crew'  #: Name of Postgres table to store Crew in
+    columns: ClassVar[Tuple[str, ...]] = ('id', 'movie_id', 'credit_id', 'department', 'gender', 'job', 'name',
+                                          'profile_path')  #: Postgres columns in table order
+    column_types: ClassVar[Tuple[str, ...]] = ('integer', 'integer', 'varchar', 'varchar', 'int', 'varchar', 'varchar',
+                                               'varchar')  #: Postgres types of the columns, for binary COPY
+    _INSERT_SQL: ClassVar[str] = ("INSERT INTO tmdb_crew VALUES(%s, %s, %s, %s, %s, %s, %s, %s) "
+                                  "ON CONFLICT (id) DO NOTHING")
+
+    def __post_init__(self):
+        self.department = intern_string(self.department)
+        self.job = intern_string(self.job)
+
+    @classmethod
+    def from_row(cls, row: dict, movie_id: int) -> 'Crew':
+        """Creates a Crew from an object of a raw record
+
+        Args:
+            row: Crew object of a raw record
+            movie_id: Id of the Movie the Crew belongs to
+
+        Returns:
+            A Crew object
+        """
+        return cls(row['id'], movie_id, row['credit_id'], row['department'], row['gender'], row['job'], row['name'],
+                   row['profile_path'])
 
-    def get_insert_statement(self) -> str:
+    def get_insert_statement(self) -> Tuple[str, tuple]:
         """Generates an insert statement for the Crew object
 
         Returns:
-            Crew insert string
+            Crew insert string and its parameters
+        """
+        return self._INSERT_SQL, self.as_row_tuple()
+
+    def as_row_tuple(self) -> tuple:
+        """Gets the column values of the Crew object, in the order of ``columns``
+
+        Returns:
+            Crew row tuple
         """
-        return (f"INSERT INTO {self.table_name} VALUES({self.id}, "
-                f"{self.movie_id}, "
-                f"$${self.credit_id}$$, "
-                f"$${self.department}$$, "
-                f"{self.gender}, "
-                f"$${self.job}$$, "
-                f"$${self.name}$$, "
-                f"$${self.profile_path}$$) ON CONFLICT (id) DO NOTHING")
+        return (self.id, self.movie_id, self.credit_id, self.department, self.gender, self.job, self.name,
+                self.profile_path)
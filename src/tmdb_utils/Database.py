@@ -1,82 +1,481 @@
+import csv
+import datetime
+import io
+import logging
+import struct
+import threading
+from contextlib import contextmanager
 import psycopg2
-from typing import List, Any
+from psycopg2.extras import execute_values
+from psycopg2.pool import ThreadedConnectionPool
+from typing import List, Any, Callable, Dict, Iterator, Optional, Sequence, Set, Tuple
+
+log = logging.getLogger(__name__)
+
+
+def _array_literal(values: Sequence[Any]) -> str:
+    """Formats a sequence as a Postgres array literal"""
+    elements = []
+    for value in values:
+        if value is None:
+            elements.append('NULL')
+        elif isinstance(value, str):
+            elements.append('"' + value.replace('\\', '\\\\').replace('"', '\\"') + '"')
+        else:
+            elements.append(str(value))
+    return '{' + ','.join(elements) + '}'
+
+
+def _csv_value(value: Any) -> Any:
+    """Converts a row value to the form COPY expects in a CSV payload"""
+    if value is None:
+        return '\\N'
+    if isinstance(value, (list, tuple)):
+        return _array_literal(value)
+    return value
+
+
+_PGCOPY_HEADER = b'PGCOPY\n\xff\r\n\x00' + struct.pack('!ii', 0, 0)  #: Signature, flags and header extension length
+_PGCOPY_TRAILER = struct.pack('!h', -1)  #: Field count marking the end of a binary COPY payload
+_PG_EPOCH = datetime.date(2000, 1, 1)  #: Day zero of Postgres' binary date format
+_NULL_FIELD = struct.pack('!i', -1)  #: Length marking a NULL field
+
+
+def _encode_int4(value: Any) -> bytes:
+    return struct.pack('!i', int(value))
+
+
+def _encode_text(value: Any) -> bytes:
+    return str(value).encode('utf-8')
+
+
+def _encode_date(value: datetime.date) -> bytes:
+    return struct.pack('!i', (value - _PG_EPOCH).days)
+
+
+def _encode_float8(value: Any) -> bytes:
+    return struct.pack('!d', float(value))
+
+
+def _array_encoder(element_oid: int, encode_element: Callable[[Any], bytes]) -> Callable[[Sequence[Any]], bytes]:
+    """Builds an encoder for one-dimensional arrays of an element type"""
+    def encode(values: Sequence[Any]) -> bytes:
+        if len(values) == 0:
+            return struct.pack('!iii', 0, 0, element_oid)
+        has_null = any(value is None for value in values)
+        parts = [struct.pack('!iiiii', 1, has_null, element_oid, len(values), 1)]
+        for value in values:
+            if value is None:
+                parts.append(_NULL_FIELD)
+            else:
+                data = encode_element(value)
+                parts.append(struct.pack('!i', len(data)))
+                parts.append(data)
+        return b''.join(parts)
+    return encode
+
+
+BINARY_COPY_TYPES = {
+    'integer': _encode_int4,
+    'int': _encode_int4,
+    'varchar': _encode_text,
+    'text': _encode_text,
+    'date': _encode_date,
+    'float8': _encode_float8,
+    'integer[]': _array_encoder(23, _encode_int4),
+    'varchar[]': _array_encoder(1043, _encode_text),
+    'text[]': _array_encoder(25, _encode_text),
+}  #: Encoders for the Postgres types supported by Database.copy_rows_binary
+
+
+def _binary_copy_payload(column_types: Sequence[str], rows: List[tuple]) -> bytes:
+    """Encodes rows as a binary COPY payload"""
+    encoders = [BINARY_COPY_TYPES[column_type] for column_type in column_types]
+    field_count = struct.pack('!h', len(encoders))
+    parts = [_PGCOPY_HEADER]
+    for row in rows:
+        parts.append(field_count)
+        for encode, value in zip(encoders, row):
+            if value is None:
+                parts.append(_NULL_FIELD)
+            else:
+                data = encode(value)
+                parts.append(struct.pack('!i', len(data)))
+                parts.append(data)
+    parts.append(_PGCOPY_TRAILER)
+    return b''.join(parts)
 
 
 class Database:
-    """Utility functions for Postgres, wraps psycopg2 functionality"""
+    """Utility functions for Postgres, wraps psycopg2 functionality
 
-    def __init__(self, user: str, password: str, db_name: str, host: str, port: int):
+    Connections come from a pool, one per thread, so ingestion workers in separate threads can share a Database.
+    Statements run inside a single open transaction; call commit() once a unit of work is written.  Sessions run
+    with synchronous_commit off, so a crash may lose the last few committed transactions but never corrupts data.
+    """
+
+    def __init__(self, user: str, password: str, db_name: str, host: str, port: int, max_connections: int = 16):
         self.user = user  #: Username for database
         self.password = password  #: Password for database
         self.db_name = db_name  #: Name of the database
         self.host = host  #: Database hostname
         self.port = port  #: Database port
-        self.connection = psycopg2.connect(f'host={self.host} dbname={self.db_name} user={self.user} '
-                                           f'password={self.password}')  #: Database connection
+        self.pool = ThreadedConnectionPool(1, max_connections, host=host, dbname=db_name, user=user,
+                                           password=password, port=port)  #: Pool of database connections
+        self._local = threading.local()
+        self._sessions = {}
+
+    @property
+    def connection(self) -> 'psycopg2.extensions.connection':
+        """Connection of the current thread, checked out of the pool on first use"""
+        connection = getattr(self._local, 'connection', None)
+        if connection is None:
+            connection = self.pool.getconn()
+            if connection not in self._sessions:
+                connection.autocommit = False
+                with connection.cursor() as cur:
+                    cur.execute("SET synchronous_commit = OFF")
+                connection.commit()
+                self._sessions[connection] = {'staging_tables': set(), 'lookup_cache': {}}
+            self._local.connection = connection
+        return connection
 
-    def execute_insert(self, statement: str) -> bool:
+    @property
+    def staging_tables(self) -> Set[str]:
+        """Names of the temporary staging tables already created for copy_rows on the current connection"""
+        return self._sessions[self.connection]['staging_tables']
+
+    @property
+    def lookup_cache(self) -> Dict[str, Dict[str, int]]:
+        """Ids of lookup table rows by their natural key, keyed by table"""
+        return self._sessions[self.connection]['lookup_cache']
+
+    @contextmanager
+    def cursor(self) -> Iterator['psycopg2.extensions.cursor']:
+        """Opens a cursor on the current thread's connection and closes it afterwards"""
+        cur = self.connection.cursor()
+        try:
+            yield cur
+        finally:
+            cur.close()
+
+    def release(self):
+        """Returns the current thread's connection to the pool.  Any open transaction should be committed first
+
+        Uncommitted work is rolled back, which also clears the connection's caches so the next user of the
+        connection does not see ids of rows that were never committed.
+        """
+        connection = getattr(self._local, 'connection', None)
+        if connection is not None:
+            self.rollback()
+            del self._local.connection
+            self.pool.putconn(connection)
+
+    def commit(self):
+        """Commits the open transaction"""
+        self.connection.commit()
+
+    def rollback(self):
+        """Rolls back the open transaction"""
+        self.connection.rollback()
+        self.staging_tables.clear()
+        self.lookup_cache.clear()
+
+    def execute_insert(self, statement: str, params: tuple = None) -> bool:
         """Executes an insert command
 
         Args:
-            statement: The insert statement to execute
+            statement: The insert statement to execute, with %s placeholders for any parameters
+            params: Values bound to the placeholders of the statement
 
         Returns:
-            True if there was no error, False otherwise
+            True if there was no error, False otherwise.  On error the open transaction is rolled back
         """
-        cur = self.connection.cursor()
-        try:
-            cur.execute(statement)
-        except Exception as e:
-            print(f'Error executing insert statement: {statement} with error: {e}')
-            self.connection.rollback()
-            return False
-        self.connection.commit()
-        return True
+        with self.cursor() as cur:
+            try:
+                cur.execute(statement, params)
+            except Exception as e:
+                log.error('Error executing insert statement: %s with error: %s', statement, e)
+                self.rollback()
+                return False
+            return True
+
+    def execute_batch_insert(self, table: str, columns: Sequence[str], rows: List[tuple], page_size: int = 1000) -> bool:
+        """Inserts many rows into a table, sending up to page_size rows per statement
+
+        Args:
+            table: Name of the table to insert into
+            columns: Names of the columns, in the order of the values in each row
+            rows: Row tuples to insert
+            page_size: Maximum number of rows sent in a single statement
+
+        Returns:
+            True if there was no error, False otherwise.  On error the open transaction is rolled back
+        """
+        if not rows:
+            return True
+        statement = f"INSERT INTO {table} ({', '.join(columns)}) VALUES %s ON CONFLICT (id) DO NOTHING"
+        with self.cursor() as cur:
+            try:
+                execute_values(cur, statement, rows, page_size=page_size)
+            except Exception as e:
+                log.error('Error executing batch insert into %s with error: %s', table, e)
+                self.rollback()
+                return False
+            return True
+
+    def write_table(self, table: str, columns: Sequence[str], rows: List[tuple], column_types: Sequence[str] = None,
+                    copy: bool = False, page_size: int = 1000) -> bool:
+        """Loads the rows of one table in the way the caller asks for, without committing
+
+        Rows are loaded with binary COPY when their column types are given, with a CSV COPY when copy is set and
+        with multi-row inserts otherwise.
+
+        Args:
+            table: Name of the table to load
+            columns: Names of the columns, in the order of the values in each row
+            rows: Row tuples to load
+            column_types: Postgres types of the columns, to load the rows with binary COPY
+            copy: Whether to load the rows with a CSV COPY
+            page_size: Maximum number of rows sent in a single insert statement
+
+        Returns:
+            True if there was no error, False otherwise.  On error the open transaction is rolled back
+        """
+        if column_types is not None:
+            return self.copy_rows_binary(table, columns, column_types, rows)
+        if copy:
+            return self.copy_rows(table, columns, rows)
+        return self.execute_batch_insert(table, columns, rows, page_size=page_size)
+
+    def execute_inserts(self, inserts: List[Tuple[str, Sequence[str], List[tuple]]]) -> bool:
+        """Inserts rows into several tables with a single round trip
+
+        One multi-row INSERT ... ON CONFLICT (id) DO NOTHING is built per table, and all of them are sent to the
+        server as one semicolon-separated command.
+
+        Args:
+            inserts: Tuples of table name, column names and row tuples, in the order the tables must be written
+
+        Returns:
+            True if there was no error, False otherwise.  On error the open transaction is rolled back
+        """
+        with self.cursor() as cur:
+            try:
+                statements = []
+                for table, columns, rows in inserts:
+                    if not rows:
+                        continue
+                    row_template = '(' + ', '.join(['%s'] * len(columns)) + ')'
+                    values = b', '.join(cur.mogrify(row_template, row) for row in rows)
+                    statements.append(f"INSERT INTO {table} ({', '.join(columns)}) VALUES ".encode() + values
+                                      + b" ON CONFLICT (id) DO NOTHING")
+                if statements:
+                    cur.execute(b';\n'.join(statements))
+            except Exception as e:
+                log.error('Error executing inserts into %s with error: %s', ', '.join(insert[0] for insert in inserts), e)
+                self.rollback()
+                return False
+            return True
+
+    def copy_rows(self, table: str, columns: Sequence[str], rows: List[tuple]) -> bool:
+        """Loads many rows into a table with a CSV COPY, skipping rows whose id already exists
+
+        The rows are copied into a temporary staging table and moved into the target table with
+        INSERT ... ON CONFLICT, since COPY itself cannot skip conflicting rows.  Staging tables are private to the
+        connection and emptied on commit, so threads loading the same table do not block each other.
 
-    def execute_query(self, statement: str) -> List[Any]:
+        Args:
+            table: Name of the table to load into
+            columns: Names of the columns, in the order of the values in each row
+            rows: Row tuples to load
+
+        Returns:
+            True if there was no error, False otherwise.  On error the open transaction is rolled back
+        """
+        if not rows:
+            return True
+
+        def payload() -> io.StringIO:
+            buf = io.StringIO()
+            writer = csv.writer(buf)
+            for row in rows:
+                writer.writerow([_csv_value(value) for value in row])
+            buf.seek(0)
+            return buf
+
+        return self._copy_through_staging(table, columns, "FORMAT csv, NULL '\\N'", payload)
+
+    def copy_rows_binary(self, table: str, columns: Sequence[str], column_types: Sequence[str],
+                         rows: List[tuple]) -> bool:
+        """Loads many rows into a table with a binary COPY, skipping rows whose id already exists
+
+        Works like copy_rows, but sends the values in Postgres' binary format so the server does not have to parse
+        them from text.  Only the types in BINARY_COPY_TYPES are supported.
+
+        Args:
+            table: Name of the table to load into
+            columns: Names of the columns, in the order of the values in each row
+            column_types: Postgres types of the columns
+            rows: Row tuples to load
+
+        Returns:
+            True if there was no error, False otherwise.  On error the open transaction is rolled back
+        """
+        if not rows:
+            return True
+        return self._copy_through_staging(table, columns, "FORMAT binary",
+                                          lambda: io.BytesIO(_binary_copy_payload(column_types, rows)))
+
+    def _copy_through_staging(self, table: str, columns: Sequence[str], options: str,
+                              payload: Callable[[], io.IOBase]) -> bool:
+        """COPYs a payload into the staging table of a table and moves the new rows into the table
+
+        The payload is built inside the error handling, so rows that cannot be encoded roll the transaction back.
+        Rows staged earlier in the same transaction stay in the staging table until commit; moving them again is a
+        no-op because of the ON CONFLICT clause.
+        """
+        staging_table = f'tmp_{table}'
+        column_list = ', '.join(columns)
+        with self.cursor() as cur:
+            try:
+                buf = payload()
+                if staging_table not in self.staging_tables:
+                    cur.execute(f"CREATE TEMP TABLE IF NOT EXISTS {staging_table} (LIKE {table}) "
+                                f"ON COMMIT DELETE ROWS")
+                    self.staging_tables.add(staging_table)
+                cur.copy_expert(f"COPY {staging_table} ({column_list}) FROM STDIN WITH ({options})", buf)
+                cur.execute(f"INSERT INTO {table} ({column_list}) SELECT {column_list} FROM {staging_table} "
+                            f"ON CONFLICT (id) DO NOTHING")
+            except Exception as e:
+                log.error('Error copying rows into %s with error: %s', table, e)
+                self.rollback()
+                return False
+            return True
+
+    def execute_query(self, statement: str, params: tuple = None) -> List[Any]:
         """Executes a query statement
 
         Args:
-            statement:  The query statement to execute
+            statement:  The query statement to execute, with %s placeholders for any parameters
+            params: Values bound to the placeholders of the statement
 
         Returns:
             A list of tuples with the result of the query, or None if an error occurred.
         """
-        cur = self.connection.cursor()
-        try:
-            cur.execute(statement)
-        except Exception as e:
-            print(f'Error executing insert statement: {statement} with error: {e}')
-            self.connection.rollback()
-            return None
-        self.connection.commit()
-        return [item for item in cur]
+        with self.cursor() as cur:
+            try:
+                cur.execute(statement, params)
+            except Exception as e:
+                log.error('Error executing insert statement: %s with error: %s', statement, e)
+                self.rollback()
+                return None
+            return cur.fetchall()
 
-    def execute_query_for_one(self, statement: str) -> Any:
+    def execute_query_for_one(self, statement: str, params: tuple = None) -> Any:
         """Executes a query statement that returns a single item
 
                 Args:
-                    statement:  The query statement to execute
+                    statement:  The query statement to execute, with %s placeholders for any parameters
+                    params: Values bound to the placeholders of the statement
 
                 Returns:
                     A tuple with the result of the query, or None if an error occurred.
                 """
-        cur = self.connection.cursor()
-        try:
-            cur.execute(statement)
-        except Exception as e:
-            print(f'Error executing insert statement: {statement} with error: {e}')
-            self.connection.rollback()
-            return None
-        self.connection.commit()
-        data = list(cur)
-        if len(data) == 0:
+        with self.cursor() as cur:
+            try:
+                cur.execute(statement, params)
+            except Exception as e:
+                log.error('Error executing insert statement: %s with error: %s', statement, e)
+                self.rollback()
+                return None
+            row = cur.fetchone()
+            return None if row is None else row[0]
+
+    def load_lookup(self, table: str, key_column: str) -> Optional[Dict[str, int]]:
+        """Loads the ids of all rows of a lookup table into lookup_cache
+
+        Args:
+            table: Name of the lookup table
+            key_column: Column holding the natural key of the rows
+
+        Returns:
+            A dictionary of ids by natural key, or None if an error occurred.  Nothing is cached on error
+        """
+        rows = self.execute_query(f"SELECT id, {key_column} FROM {table}")
+        if rows is None:
             return None
-        else:
-            return data[0][0]
+        self.lookup_cache[table] = {key: id for id, key in rows}
+        return self.lookup_cache[table]
+
+    def insert_lookup_rows(self, table: str, key_column: str, columns: Sequence[str],
+                           rows: List[tuple]) -> Dict[str, int]:
+        """Inserts rows into a lookup table with a single statement and gets their ids
+
+        Rows whose natural key already exists are skipped, and their existing ids are queried instead.
+
+        Args:
+            table: Name of the lookup table
+            key_column: Column holding the natural key of the rows
+            columns: Names of the columns, in the order of the values in each row
+            rows: Row tuples to insert
+
+        Returns:
+            A dictionary of ids by natural key, or None if an error occurred.  On error the open transaction is
+            rolled back
+        """
+        if not rows:
+            return {}
+        key_index = list(columns).index(key_column)
+        with self.cursor() as cur:
+            try:
+                ids = dict(execute_values(cur, f"INSERT INTO {table} ({', '.join(columns)}) VALUES %s "
+                                               f"ON CONFLICT ({key_column}) DO NOTHING RETURNING {key_column}, id",
+                                          rows, fetch=True))
+                existing = [row[key_index] for row in rows if row[key_index] not in ids]
+                if existing:
+                    cur.execute(f"SELECT {key_column}, id FROM {table} WHERE {key_column} = ANY(%s)", (existing,))
+                    ids.update(cur.fetchall())
+            except Exception as e:
+                log.error('Error inserting lookup rows into %s with error: %s', table, e)
+                self.rollback()
+                return None
+            return ids
+
+    def execute_commands(self, commands: List[str]) -> bool:
+        """Executes commands in a single transaction, stopping at the first one that fails
+
+        Args:
+            commands: The commands to execute, in order
+
+        Returns:
+            True if every command succeeded and the transaction was committed, False otherwise.  On error the open
+            transaction is rolled back
+        """
+        for command in commands:
+            if not self.execute_insert(command):
+                return False
+        self.commit()
+        return True
+
+    def set_up_tables(self) -> bool:
+        """Creates the tables needed for the TMDB database, including their foreign keys and indexes
+
+        Returns:
+            True if the tables, foreign keys and indexes were created, False otherwise
+        """
+        return self.create_tables() and self.finalize_indexes()
+
+    def create_tables(self) -> bool:
+        """Creates the tables needed for the TMDB database, without foreign keys or secondary indexes
 
-    def set_up_tables(self):
-        """Creates the tables needed for the TMDB database"""
+        Use this before a bulk load and call finalize_indexes afterwards, so the constraints are checked and the
+        indexes built once over the loaded tables instead of on every inserted row.  Primary keys are kept, since
+        inserts rely on them to skip existing rows.
+
+        Returns:
+            True if all tables were created, False if a statement failed and nothing was committed
+        """
         commands = ["""CREATE TABLE IF NOT EXISTS tmdb_movies (
     id integer PRIMARY KEY,
     collection_id integer,
@@ -137,7 +536,7 @@ class Database:
                     """,
                     """CREATE TABLE IF NOT EXISTS tmdb_cast (
     id integer,
-    movie_id integer REFERENCES tmdb_movies(id),
+    movie_id integer,
     cast_id integer,
     credit_id varchar(255),
     character varchar(255) ARRAY,
@@ -150,7 +549,7 @@ class Database:
                     """,
                     """CREATE TABLE IF NOT EXISTS tmdb_crew (
     id integer,
-    movie_id integer REFERENCES tmdb_movies(id),
+    movie_id integer,
     credit_id varchar(255),
     department varchar(255),
     gender int,
@@ -161,12 +560,31 @@ class Database:
 );
                     """
                     ]
-        for command in commands:
-            self.execute_insert(command)
+        return self.execute_commands(commands)
+
+    def finalize_indexes(self) -> bool:
+        """Adds the foreign keys and secondary indexes left out by create_tables
+
+        Returns:
+            True if all foreign keys and indexes were added, False if a statement failed, for example because loaded
+            rows violate a foreign key, and nothing was committed
+        """
+        commands = ["""ALTER TABLE tmdb_cast DROP CONSTRAINT IF EXISTS tmdb_cast_movie_id_fkey,
+    ADD CONSTRAINT tmdb_cast_movie_id_fkey FOREIGN KEY (movie_id) REFERENCES tmdb_movies(id);""",
+                    """ALTER TABLE tmdb_crew DROP CONSTRAINT IF EXISTS tmdb_crew_movie_id_fkey,
+    ADD CONSTRAINT tmdb_crew_movie_id_fkey FOREIGN KEY (movie_id) REFERENCES tmdb_movies(id);""",
+                    """CREATE INDEX IF NOT EXISTS tmdb_cast_movie_id_idx ON tmdb_cast (movie_id);""",
+                    """CREATE INDEX IF NOT EXISTS tmdb_crew_movie_id_idx ON tmdb_crew (movie_id);"""
+                    ]
+        return self.execute_commands(commands)
 
     def drop_all_tables(self):
         """Drops all TMDB tables from Postgres"""
         self.execute_insert("""DROP TABLE tmdb_movies, tmdb_collection, tmdb_genres, tmdb_production_companies, tmdb_countries, tmdb_languages, tmdb_keywords, tmdb_cast, tmdb_crew;""")
+        if self.staging_tables:
+            self.execute_insert(f"DROP TABLE IF EXISTS {', '.join(sorted(self.staging_tables))}")
+        self.commit()
+        self.staging_tables.clear()
 
     def __del__(self):
-        self.connection.close()
+        self.pool.closeall()
@@ -0,0 +1,53 @@
+"""Parsing of raw TMDB records
+
+Helpers shared by Record and RecordBatch, which build Movies and columnar batches from the same raw records
+
+"""
+import ast
+import datetime
+import sys
+from functools import lru_cache
+from operator import attrgetter
+from typing import List
+
+from dateutil import parser
+
+try:
+    from orjson import loads
+except ImportError:
+    from json import loads
+
+BASIC_KEYS = ('id', 'budget', 'homepage', 'imdb_id', 'original_language', 'original_title', 'overview', 'popularity',
+              'poster_path', 'runtime', 'status', 'tagline', 'title', 'revenue')  #: Columns passed to Record unchanged
+JSON_COLUMNS = ('belongs_to_collection', 'genres', 'production_companies', 'production_countries', 'spoken_languages',
+                'keywords', 'cast', 'crew')  #: Columns holding a list of objects
+id_of = attrgetter('id')  #: Gets the id of a related object
+
+
+def intern_string(value: str) -> str:
+    """Interns a low-cardinality string, so records that share it share one object"""
+    return sys.intern(value) if type(value) is str else value
+
+
+def parse_object_column(value: str) -> List[dict]:
+    """Parses a column holding a list of objects, written either as JSON or as a Python literal"""
+    if value == '' or value == '#N/A':
+        return []
+    try:
+        return loads(value)
+    except ValueError:
+        return ast.literal_eval(value)
+
+
+@lru_cache(maxsize=8192)
+def parse_release_date(value: str) -> datetime.date:
+    """Parses a release date, normally written as YYYY-MM-DD.  Returns None for an empty date
+
+    Results are cached, since many movies share a release date.
+    """
+    if not value:
+        return None
+    try:
+        return datetime.date.fromisoformat(value)
+    except ValueError:
+        return parser.parse(value, fuzzy_with_tokens=True)[0].date()
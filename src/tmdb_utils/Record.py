@@ -1,14 +1,29 @@
 import datetime
-import ast
-from typing import List, Any
+import logging
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from typing import List, Any, Tuple
 
 from . import DataClasses as dc
 from . import Database as db
-from dateutil import parser
+from .Parsing import (BASIC_KEYS, JSON_COLUMNS, id_of, intern_string, loads, parse_object_column,
+                      parse_release_date)
 
+log = logging.getLogger(__name__)
 
 class Record:
     """Represents a complete record of TMDB movie"""
+    __slots__ = ('id', 'budget', 'homepage', 'imdb_id', 'original_language', 'original_title', 'overview', 'popularity',
+                 'poster_path', 'release_date', 'runtime', 'status', 'tagline', 'title', 'revenue', 'collection',
+                 'production_companies', 'production_countries', 'keywords', 'cast', 'crew', 'spoken_languages',
+                 'genres', 'table_name')
+    columns = ('id', 'collection_id', 'budget', 'genre_ids', 'homepage', 'imdb_id', 'original_language_id',
+               'original_title', 'overview', 'popularity', 'poster_path', 'production_company_ids',
+               'production_country_ids', 'release_date', 'runtime', 'spoken_language_ids', 'status', 'tagline',
+               'title', 'keyword_ids', 'revenue')  #: Postgres columns of the Movie table in table order
+    _INSERT_SQL = ("INSERT INTO {table_name} VALUES(" + ', '.join(['%s'] * len(columns)) + ") "
+                   "ON CONFLICT (id) DO NOTHING")
+
     def __init__(self, id: int, budget: int, homepage: str, imdb_id: str, original_language: str, original_title: str,
                  overview: str, popularity: float, poster_path: str, release_date: datetime.date, runtime: int,
                  status: str, tagline: str, title: str, revenue: int, collection: dc.Collection,
@@ -19,14 +34,14 @@ class Record:
         self.budget = budget #: Movie budget
         self.homepage = homepage  #: Link to movie homepage
         self.imdb_id = imdb_id  #: Movie id on IMDB
-        self.original_language = original_language
+        self.original_language = intern_string(original_language)
         self.original_title = original_title  #: Original title of the Movie
         self.overview = overview  #: Overview of the movie
         self.popularity = popularity  #: Popularity of movie out of 100
         self.poster_path = poster_path  #: Link to movie poster
         self.release_date = release_date  #: Release date of the movie
         self.runtime = runtime  #: Runtime of the movie
-        self.status = status  #: Release status of the movie
+        self.status = intern_string(status)  #: Release status of the movie
         self.tagline = tagline  #: Movie tagline
         self.title = title  #: Movie title
         self.revenue = revenue  #: Revenue of the movie
@@ -45,128 +60,264 @@ class Record:
         """Creates a new Record from a dictionary
 
         Args:
-             raw_record: The raw record in a dictionary, usually from parsing with the csv library
+             raw_record: The raw record in a dictionary, usually from parsing with the csv library.  Object columns
+                may hold JSON, a Python literal, or the already parsed lists.  JSON is decoded with orjson when it is
+                installed
 
         Returns:
              A Record object
         """
-        basic_keys = ['id', 'budget', 'homepage', 'imdb_id', 'original_language', 'original_title', 'overview',
-                      'popularity', 'poster_path', 'runtime', 'status', 'tagline', 'title', 'revenue', ]
-        unchanged_items = {key: value for key, value in raw_record.items() if key in basic_keys}
-        json_columns = ['belongs_to_collection', 'genres', 'production_companies', 'production_countries',
-                        'spoken_languages', 'keywords', 'cast', 'crew']
-        for key, value in raw_record.items():
-            if key in json_columns:
-                if value == '' or value == '#N/A':
-                    raw_record[key] = []
-                else:
-                    raw_record[key] = ast.literal_eval(value)
-        release_date = parser.parse(raw_record['release_date'], fuzzy_with_tokens=True)[0].date()
-
-        genres = [dc.Genre(**genre) for genre in raw_record['genres']]
-        collection = [dc.Collection(**collection) for collection in raw_record['belongs_to_collection']][0] if len(raw_record['belongs_to_collection']) != 0  else dc.Collection(id=-1, name='', poster_path='', backdrop_path='')
-        companies = [dc.ProductionCompany(**company) for company in raw_record['production_companies']]
-        keywords = [dc.Keyword(**keyword) for keyword in raw_record['keywords']]
-        cast = [dc.Cast(movie_id=raw_record['id'], **person) for person in raw_record['cast']]
-        crew = [dc.Crew(movie_id=raw_record['id'], **person) for person in raw_record['crew']]
-        spoken_languages = [dc.Language(**language) for language in raw_record['spoken_languages']]
-        countries = [dc.Country(**country) for country in raw_record['production_countries']]
-
-        return Record(release_date=release_date, genres=genres, collection=collection, production_companies=companies,
-                      keywords=keywords, cast=cast, crew=crew, spoken_languages=spoken_languages,
-                      production_countries=countries, **unchanged_items)
-
-    def get_movie_insert_statement(self) -> str:
+        return Record(**Record.parse_fields(raw_record))
+
+    @staticmethod
+    def parse_fields(raw_record: dict) -> dict:
+        """Parses the fields of a raw record into the arguments of the Record constructor
+
+        Object columns holding JSON or a Python literal are replaced with the parsed lists in raw_record.  A record
+        without a collection gets a placeholder Collection with the id -1.
+
+        Args:
+             raw_record: The raw record in a dictionary, as accepted by from_dict
+
+        Returns:
+             A dictionary of Record constructor arguments
+        """
+        fields = {key: raw_record[key] for key in BASIC_KEYS}
+        for key in JSON_COLUMNS:
+            value = raw_record[key]
+            if isinstance(value, str):
+                raw_record[key] = parse_object_column(value)
+
+        movie_id = raw_record['id']
+        collections = raw_record['belongs_to_collection']
+        fields['release_date'] = parse_release_date(raw_record['release_date'])
+        fields['genres'] = list(map(dc.Genre.from_row, raw_record['genres']))
+        fields['collection'] = (dc.Collection.from_row(collections[0]) if collections
+                                else dc.Collection(id=-1, name='', poster_path='', backdrop_path=''))
+        fields['production_companies'] = list(map(dc.ProductionCompany.from_row, raw_record['production_companies']))
+        fields['keywords'] = list(map(dc.Keyword.from_row, raw_record['keywords']))
+        fields['cast'] = list(map(partial(dc.Cast.from_row, movie_id=movie_id), raw_record['cast']))
+        fields['crew'] = list(map(partial(dc.Crew.from_row, movie_id=movie_id), raw_record['crew']))
+        fields['spoken_languages'] = list(map(dc.Language.from_row, raw_record['spoken_languages']))
+        fields['production_countries'] = list(map(dc.Country.from_row, raw_record['production_countries']))
+        return fields
+
+    @staticmethod
+    def from_json(document: bytes) -> 'Record':
+        """Creates a new Record from a JSON document, decoded with orjson when it is installed
+
+        Args:
+             document: The raw record as a JSON object, for example the contents of a file opened in binary mode
+
+        Returns:
+             A Record object
+        """
+        return Record.from_dict(loads(document))
+
+    @staticmethod
+    def parse_many(raw_records: List[dict], workers: int = None, chunksize: int = 1024) -> List['Record']:
+        """Creates Records from many raw records, parsing them in parallel across processes
+
+        Args:
+             raw_records: The raw records, as accepted by from_dict
+             workers: Number of worker processes, defaults to the number of processors
+             chunksize: Number of raw records sent to a worker at a time
+
+        Returns:
+             A list of Record objects, in the order of the raw records
+        """
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            return list(executor.map(Record.from_dict, raw_records, chunksize=chunksize))
+
+    def get_movie_insert_statement(self) -> Tuple[str, tuple]:
         """Generates an insert statement for the Movie table
 
         Returns:
-            Movie insert string
+            Movie insert string and its parameters
         """
-        genre_ids = ' ,'.join([str(genre.id) for genre in self.genres])
-        genre_array_string = f"ARRAY [{genre_ids}], " if len(genre_ids) >= 1 else "NULL, "
-        production_company_ids = ', '.join([str(company.id) for company in self.production_companies])
-        production_array_string = f"ARRAY [{production_company_ids}], " if len(production_company_ids) >= 1 else "NULL, "
-        production_country_ids = ', '.join([str(country.id) for country in self.production_countries if country.id is not ''])
-        country_array_string = f"ARRAY [{production_country_ids}], " if len(production_country_ids) >= 1 else "NULL, "
-        spoken_language_ids = ', '.join([str(language.id) for language in self.spoken_languages if language.id is not ''])
-        language_array_string = f"ARRAY [{spoken_language_ids}], " if len(spoken_language_ids) >= 1 else "NULL, "
-        keyword_ids = ', '.join([str(keyword.id) for keyword in self.keywords])
-        keyword_array_string = f"ARRAY [{keyword_ids}], " if len(keyword_ids) >= 1 else "NULL, "
-
-        return (f"INSERT INTO {self.table_name} VALUES({self.id}, "
-                f"{self.collection.id if self.collection.id != -1 else 'NULL'}, "
-                f"{self.budget}, "
-                f"{genre_array_string}"
-                f"$${self.homepage}$$, "
-                f"$${self.imdb_id}$$, "
-                f"$${self.original_language}$$, "
-                f"$${self.original_title}$$, "
-                f"$${self.overview}$$, "
-                f"{self.popularity}, "
-                f"$${self.poster_path}$$, "
-                f"{production_array_string}"
-                f"{country_array_string}"
-                f"$${self.release_date}$$, "
-                f"{self.runtime if self.runtime is not '' else 'Null'}, "
-                f"{language_array_string}"
-                f"$${self.status}$$, "
-                f"$${self.tagline}$$, "
-                f"$${self.title}$$, "
-                f"{keyword_array_string}"
-                f"{self.revenue}) ON CONFLICT (id) DO NOTHING")
-
-    def write_to_postgres(self, database: db.Database):
-        """Writes the Movie to Postgres
+        return self._INSERT_SQL.format(table_name=self.table_name), self.as_row_tuple()
+
+    def as_row_tuple(self) -> tuple:
+        """Gets the column values of the Movie, in the order of ``columns``
+
+        Returns:
+            Movie row tuple
+        """
+        return (self.id,
+                self.collection.id if self.collection.id != -1 else None,
+                self.budget,
+                list(map(id_of, self.genres)) or None,
+                self.homepage,
+                self.imdb_id,
+                self.original_language,
+                self.original_title,
+                self.overview,
+                self.popularity,
+                self.poster_path,
+                list(map(id_of, self.production_companies)) or None,
+                [country.id for country in self.production_countries if country.id not in (None, '')] or None,
+                self.release_date,
+                self.runtime if self.runtime != '' else None,
+                [language.id for language in self.spoken_languages if language.id not in (None, '')] or None,
+                self.status,
+                self.tagline,
+                self.title,
+                list(map(id_of, self.keywords)) or None,
+                self.revenue)
+
+    def collections(self) -> Tuple[dc.Collection, ...]:
+        """Gets the collections to write for the Movie, empty for the placeholder of a Movie without a collection"""
+        return (self.collection,) if self.collection.id != -1 else ()
+
+    def write_to_postgres(self, database: db.Database) -> bool:
+        """Writes the Movie to Postgres in a single transaction
+
+        The Movie and all of its related rows are sent in one round trip, with one multi-row insert per table.
 
         Args:
             database: Database object to write to
 
         Returns:
+            True if the Movie was written, False if a write failed and the transaction was rolled back
+        """
+        if not (Record._assign_ids(self.spoken_languages, database)
+                and Record._assign_ids(self.production_countries, database)):
+            log.warning('Failed to look up the language and country ids of Movie: %s', self.title)
+            return False
+
+        inserts = [(self.table_name, self.columns, [self.as_row_tuple()])]
+        for element_class, items in ((dc.Collection, self.collections()), (dc.Genre, self.genres),
+                                     (dc.ProductionCompany, self.production_companies), (dc.Keyword, self.keywords),
+                                     (dc.Cast, self.cast), (dc.Crew, self.crew)):
+            inserts.append((element_class.table_name, element_class.columns, [item.as_row_tuple() for item in items]))
+        if not database.execute_inserts(inserts):
+            log.warning('Failed to write Movie: %s to Postgres', self.title)
+            return False
+        database.commit()
+        return True
+
+    @staticmethod
+    def write_many(records: List['Record'], database: db.Database, page_size: int = 10000) -> bool:
+        """Writes many Movies to Postgres in a single transaction, with one bulk load per table
+
+        Rows are collected across all records and de-duplicated by id before being written.  The Movie, Cast and
+        Crew tables, which get the most and widest rows, are loaded with COPY; the smaller tables with multi-row
+        inserts.
 
+        Args:
+            records: Records to write
+            database: Database object to write to
+            page_size: Maximum number of rows sent in a single insert statement
+
+        Returns:
+            True if the Movies were written, False if a write failed and the transaction was rolled back
         """
-        for language in self.spoken_languages:
-            language.id = self.get_id(language, database)
-        for country in self.production_countries:
-            country.id = self.get_id(country, database)
-
-        if not database.execute_insert(self.get_movie_insert_statement()):
-            print(f'Failed to write Movie: {self.title} to Postgres')
-        if database.execute_insert(self.collection.get_insert_statement()):
-            pass
-        else:
-            print(f'Failed to write Collection: {self.collection.name}')
-        for genre in self.genres:
-            if not database.execute_insert(genre.get_insert_statement()):
-                print(f'Failed to write Genre: {genre.name}')
-        for company in self.production_companies:
-            if not database.execute_insert(company.get_insert_statement()):
-                print(f'Failed to write Company: {company.name}')
-        for keyword in self.keywords:
-            if not database.execute_insert(keyword.get_insert_statement()):
-                print(f'Failed to write Keyword: {keyword.name}')
-        for person in self.cast:
-            if not database.execute_insert(person.get_insert_statement()):
-                print(f'Failed to write Cast: {person.name}')
-        for person in self.crew:
-            if not database.execute_insert(person.get_insert_statement()):
-                print(f'Failed to write Crew: {person.name}')
+        element_classes = (dc.Collection, dc.Genre, dc.ProductionCompany, dc.Keyword, dc.Cast, dc.Crew)
+        tables = {}  # table name -> (columns, ids already collected, rows), in the order the tables must be written
+        for record in records:
+            tables.setdefault(record.table_name, (record.columns, set(), []))
+        for element_class in element_classes:
+            tables[element_class.table_name] = (element_class.columns, set(), [])
+        collections, genres, companies, keywords, cast, crew = (tables[c.table_name] for c in element_classes)
+
+        if not (Record._assign_ids([language for record in records for language in record.spoken_languages], database)
+                and Record._assign_ids([country for record in records for country in record.production_countries],
+                                       database)):
+            log.warning('Failed to look up the language and country ids of %d Movies', len(records))
+            return False
+
+        for record in records:
+            for (_, seen_ids, rows), items in ((tables[record.table_name], (record,)),
+                                               (collections, record.collections()), (genres, record.genres),
+                                               (companies, record.production_companies), (keywords, record.keywords),
+                                               (cast, record.cast), (crew, record.crew)):
+                for item in items:
+                    if item.id not in seen_ids:
+                        seen_ids.add(item.id)
+                        rows.append(item.as_row_tuple())
+
+        movie_tables = {record.table_name for record in records}
+        binary_copy_types = {element_class.table_name: element_class.column_types for element_class in element_classes
+                             if hasattr(element_class, 'column_types')}
+        for table_name, (columns, _, rows) in tables.items():
+            if not database.write_table(table_name, columns, rows, column_types=binary_copy_types.get(table_name),
+                                        copy=table_name in movie_tables, page_size=page_size):
+                log.warning('Failed to write %d rows to %s', len(rows), table_name)
+                return False
+        database.commit()
+        log.debug('Wrote %d Movies to Postgres', len(records))
+        return True
 
     @staticmethod
     def get_id(obj: Any, database: db.Database) -> int:
         """Gets the id of an object.  If the object doesn't exist in the database, will write it and return the new id
 
+        Ids are served from the database's lookup cache, which is loaded with a single query the first time an object
+        of a table is looked up.  An object missing from the cache is inserted and its new id returned in one round
+        trip; the id is only queried separately if another session inserted the object in the meantime.
+
         Args:
             obj: Object to ge the id for
             database: Database object to write to
 
         Returns:
-            The id as an integer
+            The id as an integer, or None if an error occurred
         """
-        orig_id = database.execute_query_for_one(obj.get_id_query_statement())
+        ids = database.lookup_cache.get(obj.table_name)
+        if ids is None:
+            ids = database.load_lookup(obj.table_name, obj.key_column)
+            if ids is None:
+                return None
+        key = getattr(obj, obj.key_column)
+        orig_id = ids.get(key)
+        if orig_id is not None:
+            return orig_id
 
+        orig_id = database.execute_query_for_one(*obj.get_insert_returning_id_statement())
         if orig_id is None:
-            database.execute_insert(obj.get_insert_statement())
-            return database.execute_query_for_one(obj.get_id_query_statement())
-        else:
-            return orig_id
+            orig_id = database.execute_query_for_one(*obj.get_id_query_statement())
+        if orig_id is not None:
+            ids[key] = orig_id
+        return orig_id
+
+    @staticmethod
+    def get_ids(objs: List[Any], database: db.Database) -> List[int]:
+        """Gets the ids of many objects of one table, writing the ones missing from the database with a single insert
 
+        Args:
+            objs: Objects to get the ids for
+            database: Database object to write to
+
+        Returns:
+            The ids as integers, in the order of the objects, or None if the ids could not be loaded or the missing
+            objects could not be written.  On error the open transaction is rolled back
+        """
+        if not objs:
+            return []
+        table_name, key_column = objs[0].table_name, objs[0].key_column
+        ids = database.lookup_cache.get(table_name)
+        if ids is None:
+            ids = database.load_lookup(table_name, key_column)
+            if ids is None:
+                return None
+        missing = {}
+        for obj in objs:
+            key = getattr(obj, key_column)
+            if key not in ids and key not in missing:
+                missing[key] = obj.as_row_tuple()[1:]
+        if missing:
+            new_ids = database.insert_lookup_rows(table_name, key_column, objs[0].columns[1:], list(missing.values()))
+            if new_ids is None:
+                return None
+            ids.update(new_ids)
+        return [ids.get(getattr(obj, key_column)) for obj in objs]
+
+    @staticmethod
+    def _assign_ids(objs: List[Any], database: db.Database) -> bool:
+        """Sets the ids of many objects of one table from get_ids.  Returns False if they could not be looked up"""
+        orig_ids = Record.get_ids(objs, database)
+        if orig_ids is None:
+            return False
+        for obj, orig_id in zip(objs, orig_ids):
+            obj.id = orig_id
+        return True
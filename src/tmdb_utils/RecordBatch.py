@@ -0,0 +1,152 @@
+"""Columnar batches of TMDB records
+
+Collects the Movie rows of many raw records as one list per column, so a batch can be loaded into Postgres without
+building a Record for every movie
+
+"""
+import logging
+from typing import List
+
+from . import DataClasses as dc
+from . import Database as db
+from .Parsing import id_of, intern_string
+from .Record import Record
+
+log = logging.getLogger(__name__)
+
+
+class RecordBatch:
+    """A batch of TMDB records stored column by column, in the order of ``Record.columns``"""
+    __slots__ = ('ids', 'collection_ids', 'budgets', 'genre_ids', 'homepages', 'imdb_ids', 'original_languages',
+                 'original_titles', 'overviews', 'popularities', 'poster_paths', 'production_company_ids',
+                 'production_countries', 'release_dates', 'runtimes', 'spoken_languages', 'statuses', 'taglines',
+                 'titles', 'keyword_ids', 'revenues', 'elements', 'table_name')
+    #: Classes of the related rows, in the order their tables must be written
+    element_classes = (dc.Collection, dc.Genre, dc.ProductionCompany, dc.Keyword, dc.Cast, dc.Crew)
+
+    def __init__(self, table_name: str = 'tmdb_movies'):
+        self.ids = []  #: TMDB IDs
+        self.collection_ids = []  #: Ids of the collections the movies belong to, None if they belong to none
+        self.budgets = []  #: Movie budgets
+        self.genre_ids = []  #: Lists of genre ids of each movie
+        self.homepages = []  #: Links to movie homepages
+        self.imdb_ids = []  #: Movie ids on IMDB
+        self.original_languages = []  #: Original languages of the movies
+        self.original_titles = []  #: Original titles of the movies
+        self.overviews = []  #: Overviews of the movies
+        self.popularities = []  #: Popularities of the movies out of 100
+        self.poster_paths = []  #: Links to movie posters
+        self.production_company_ids = []  #: Lists of production company ids of each movie
+        self.production_countries = []  #: Lists of countries of each movie, their ids are looked up when written
+        self.release_dates = []  #: Release dates of the movies
+        self.runtimes = []  #: Runtimes of the movies
+        self.spoken_languages = []  #: Lists of spoken languages of each movie, their ids are looked up when written
+        self.statuses = []  #: Release statuses of the movies
+        self.taglines = []  #: Movie taglines
+        self.titles = []  #: Movie titles
+        self.keyword_ids = []  #: Lists of keyword ids of each movie
+        self.revenues = []  #: Revenues of the movies
+        self.elements = {element_class.table_name: (element_class.columns, set(), [])
+                         for element_class in self.element_classes}  #: Related rows by table, de-duplicated by id
+        self.table_name = table_name  #: Name of the Postgres table to store the Movies in
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def extend_from_dict(self, raw_record: dict):
+        """Appends a raw record to the batch
+
+        Args:
+             raw_record: The raw record in a dictionary, as accepted by Record.from_dict
+        """
+        fields = Record.parse_fields(raw_record)
+        collection = fields['collection']
+        collections = (collection,) if collection.id != -1 else ()
+
+        self.ids.append(fields['id'])
+        self.collection_ids.append(collection.id if collections else None)
+        self.budgets.append(fields['budget'])
+        self.genre_ids.append(list(map(id_of, fields['genres'])) or None)
+        self.homepages.append(fields['homepage'])
+        self.imdb_ids.append(fields['imdb_id'])
+        self.original_languages.append(intern_string(fields['original_language']))
+        self.original_titles.append(fields['original_title'])
+        self.overviews.append(fields['overview'])
+        self.popularities.append(fields['popularity'])
+        self.poster_paths.append(fields['poster_path'])
+        self.production_company_ids.append(list(map(id_of, fields['production_companies'])) or None)
+        self.production_countries.append(fields['production_countries'])
+        self.release_dates.append(fields['release_date'])
+        self.runtimes.append(fields['runtime'] if fields['runtime'] != '' else None)
+        self.spoken_languages.append(fields['spoken_languages'])
+        self.statuses.append(intern_string(fields['status']))
+        self.taglines.append(fields['tagline'])
+        self.titles.append(fields['title'])
+        self.keyword_ids.append(list(map(id_of, fields['keywords'])) or None)
+        self.revenues.append(fields['revenue'])
+
+        for element_class, items in ((dc.Collection, collections), (dc.Genre, fields['genres']),
+                                     (dc.ProductionCompany, fields['production_companies']),
+                                     (dc.Keyword, fields['keywords']), (dc.Cast, fields['cast']),
+                                     (dc.Crew, fields['crew'])):
+            _, seen_ids, rows = self.elements[element_class.table_name]
+            for item in items:
+                if item.id not in seen_ids:
+                    seen_ids.add(item.id)
+                    rows.append(item.as_row_tuple())
+
+    def movie_rows(self, database: db.Database) -> List[tuple]:
+        """Gets the Movie rows of the batch, in the order of ``Record.columns``
+
+        The ids of the countries and languages are looked up, and written if they are new, as for Record.get_ids.
+
+        Args:
+            database: Database object to look the ids up in
+
+        Returns:
+            Movie row tuples, or None if the ids could not be looked up and the transaction was rolled back
+        """
+        def id_lists(objects_per_movie) -> List[List[int]]:
+            ids = Record.get_ids([obj for objects in objects_per_movie for obj in objects], database)
+            if ids is None:
+                return None
+            ids = iter(ids)
+            return [[next(ids) for _ in objects] or None for objects in objects_per_movie]
+
+        country_ids = id_lists(self.production_countries)
+        language_ids = id_lists(self.spoken_languages) if country_ids is not None else None
+        if language_ids is None:
+            return None
+        return list(zip(self.ids, self.collection_ids, self.budgets, self.genre_ids, self.homepages, self.imdb_ids,
+                        self.original_languages, self.original_titles, self.overviews, self.popularities,
+                        self.poster_paths, self.production_company_ids, country_ids, self.release_dates,
+                        self.runtimes, language_ids, self.statuses, self.taglines, self.titles, self.keyword_ids,
+                        self.revenues))
+
+    def write_to_postgres(self, database: db.Database, page_size: int = 10000) -> bool:
+        """Writes the batch to Postgres in a single transaction, with one bulk load per table
+
+        Args:
+            database: Database object to write to
+            page_size: Maximum number of rows sent in a single insert statement
+
+        Returns:
+            True if the batch was written, False if a write failed and the transaction was rolled back
+        """
+        movie_rows = self.movie_rows(database)
+        if movie_rows is None:
+            log.warning('Failed to look up the language and country ids of %d Movies', len(self))
+            return False
+        tables = [(self.table_name, Record.columns, movie_rows, None, True)]
+        for element_class in self.element_classes:
+            columns, _, rows = self.elements[element_class.table_name]
+            column_types = getattr(element_class, 'column_types', None)
+            tables.append((element_class.table_name, columns, rows, column_types, False))
+        for table_name, columns, rows, column_types, copy in tables:
+            if not database.write_table(table_name, columns, rows, column_types=column_types, copy=copy,
+                                        page_size=page_size):
+                log.warning('Failed to write %d rows to %s', len(rows), table_name)
+                return False
+        database.commit()
+        log.debug('Wrote %d Movies to Postgres', len(self))
+        return True
@@ -1,11 +1,86 @@
 #!/usr/bin/env python
 # -*- coding: utf-8 -*-
 """
-    Dummy conftest.py for tmdb_utils.
+    Shared fixtures for the tmdb_utils tests.
 
-    If you don't know what this is for, just leave it empty.
     Read more about conftest.py under:
     https://pytest.org/latest/plugins.html
 """
+from typing import Any, List
 
-# import pytest
+import pytest
+import tmdb_utils.Database as db
+
+
+class MockDB:
+    def __init__(self, query_result: Any, query_result_list: List[Any], return_error: str = False):
+        self.query_result = query_result
+        self.query_result_list = query_result_list
+        self.return_error = return_error
+        self.written = {}
+        self.writers = {}
+        self.lookup_cache = {}
+        self.queries = 0
+
+    def execute_insert(self, statement: str, params: tuple = None) -> bool:
+        if self.return_error:
+            return False
+        else:
+            return True
+
+    def execute_batch_insert(self, table: str, columns: List[str], rows: List[tuple], page_size: int = 1000) -> bool:
+        self.writers[table] = 'insert'
+        self.written.setdefault(table, []).extend(rows)
+        return not self.return_error
+
+    write_table = db.Database.write_table
+
+    def execute_inserts(self, inserts: List[tuple]) -> bool:
+        for table, columns, rows in inserts:
+            self.written.setdefault(table, []).extend(rows)
+        return not self.return_error
+
+    def copy_rows(self, table: str, columns: List[str], rows: List[tuple]) -> bool:
+        self.writers[table] = 'copy'
+        self.written.setdefault(table, []).extend(rows)
+        return not self.return_error
+
+    def copy_rows_binary(self, table: str, columns: List[str], column_types: List[str], rows: List[tuple]) -> bool:
+        self.writers[table] = 'binary'
+        self.written.setdefault(table, []).extend(rows)
+        return not self.return_error
+
+    def execute_query(self, statement: str, params: tuple = None) -> List[Any]:
+        if self.return_error:
+            return None
+        else:
+            return self.query_result_list
+
+    def execute_query_for_one(self, statement: str, params: tuple = None) -> Any:
+        self.queries += 1
+        if self.return_error:
+            return None
+        else:
+            return self.query_result
+
+    def load_lookup(self, table: str, key_column: str) -> dict:
+        self.lookup_cache[table] = {}
+        return self.lookup_cache[table]
+
+    def insert_lookup_rows(self, table: str, key_column: str, columns: List[str], rows: List[tuple]) -> dict:
+        self.queries += 1
+        if self.return_error:
+            return None
+        return {row[0]: self.query_result for row in rows}
+
+    def commit(self):
+        pass
+
+    def rollback(self):
+        pass
+
+
+@pytest.fixture
+def mock_db():
+    """Gets the MockDB class, called with the same arguments as its constructor"""
+    return MockDB
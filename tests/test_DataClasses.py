@@ -1,51 +1,83 @@
 #!/usr/bin/env python
 # -*- coding: utf-8 -*-
 
+import sys
 import pytest
 import tmdb_utils.DataClasses as dc
 
 
 def test_collection():
     collection = dc.Collection(1, 'Test Collection', '/my/poster/path', '/ma/backdrop/path')
-    assert collection.get_insert_statement() == "INSERT INTO tmdb_collection VALUES(1, $$Test Collection$$, $$/my/poster/path$$, $$/ma/backdrop/path$$) ON CONFLICT (id) DO NOTHING"
+    assert collection.get_insert_statement() == ("INSERT INTO tmdb_collection VALUES(%s, %s, %s, %s) ON CONFLICT (id) DO NOTHING",
+                                                 (1, 'Test Collection', '/my/poster/path', '/ma/backdrop/path'))
+    assert collection.as_row_tuple() == (1, 'Test Collection', '/my/poster/path', '/ma/backdrop/path')
 
 
 def test_genre():
     genre = dc.Genre(1, 'Comedy')
-    assert genre.get_insert_statement() == "INSERT INTO tmdb_genres VALUES(1, $$Comedy$$) ON CONFLICT (id) DO NOTHING"
+    assert genre.get_insert_statement() == ("INSERT INTO tmdb_genres VALUES(%s, %s) ON CONFLICT (id) DO NOTHING", (1, 'Comedy'))
+    assert genre.as_row_tuple() == (1, 'Comedy')
+    assert dc.Genre.from_row({'id': 1, 'name': 'Comedy'}) == genre
 
 
 def test_productioncompany():
     company = dc.ProductionCompany(1, 'ACME')
-    assert company.get_insert_statement() == "INSERT INTO tmdb_production_companies VALUES(1, $$ACME$$) ON CONFLICT (id) DO NOTHING"
+    assert company.get_insert_statement() == ("INSERT INTO tmdb_production_companies VALUES(%s, %s) ON CONFLICT (id) DO NOTHING",
+                                              (1, 'ACME'))
+    assert company.as_row_tuple() == (1, 'ACME')
 
 
 def test_country():
     country_with_id = dc.Country('US', 'USA', id=1)
     country_without_id = dc.Country('US', 'USA')
-    assert country_with_id.get_insert_statement() == "INSERT INTO tmdb_countries VALUES(1, $$US$$, $$USA$$) ON CONFLICT (id) DO NOTHING"
-    assert country_without_id.get_insert_statement() == "INSERT INTO tmdb_countries(iso_3166_1, name) VALUES($$US$$, $$USA$$) ON CONFLICT (id) DO NOTHING"
-    assert country_with_id.get_id_query_statement() == "SELECT id FROM tmdb_countries WHERE iso_3166_1=US"
+    assert country_with_id.get_insert_statement() == ("INSERT INTO tmdb_countries VALUES(%s, %s, %s) ON CONFLICT (id) DO NOTHING",
+                                                      (1, 'US', 'USA'))
+    assert country_without_id.get_insert_statement() == ("INSERT INTO tmdb_countries(iso_3166_1, name) VALUES(%s, %s) ON CONFLICT (id) DO NOTHING",
+                                                         ('US', 'USA'))
+    assert country_with_id.as_row_tuple() == (1, 'US', 'USA')
+    assert country_with_id.get_id_query_statement() == ("SELECT id FROM tmdb_countries WHERE iso_3166_1=%s", ('US',))
+    assert country_with_id.get_insert_returning_id_statement() == ("INSERT INTO tmdb_countries(iso_3166_1, name) VALUES(%s, %s) "
+                                                                   "ON CONFLICT (iso_3166_1) DO NOTHING RETURNING id", ('US', 'USA'))
 
 
 def test_language():
     language_with_id = dc.Language('EN', 'English', id =1)
     language_without_id = dc.Language('EN', 'English')
-    assert language_with_id.get_insert_statement() == "INSERT INTO tmdb_languages VALUES(1, $$EN$$, $$English$$) ON CONFLICT (id) DO NOTHING"
-    assert language_without_id.get_insert_statement() == "INSERT INTO tmdb_languages(iso_639_1, name) VALUES($$EN$$, $$English$$) ON CONFLICT (id) DO NOTHING"
-    assert language_with_id.get_id_query_statement() == "SELECT id FROM tmdb_languages WHERE iso_639_1=EN"
+    assert language_with_id.get_insert_statement() == ("INSERT INTO tmdb_languages VALUES(%s, %s, %s) ON CONFLICT (id) DO NOTHING",
+                                                       (1, 'EN', 'English'))
+    assert language_without_id.get_insert_statement() == ("INSERT INTO tmdb_languages(iso_639_1, name) VALUES(%s, %s) ON CONFLICT (id) DO NOTHING",
+                                                          ('EN', 'English'))
+    assert language_with_id.as_row_tuple() == (1, 'EN', 'English')
+    assert dc.Language(''.join(['E', 'N']), 'English').iso_639_1 is sys.intern('EN')
+    assert language_with_id.get_id_query_statement() == ("SELECT id FROM tmdb_languages WHERE iso_639_1=%s", ('EN',))
+    assert language_with_id.get_insert_returning_id_statement() == ("INSERT INTO tmdb_languages(iso_639_1, name) VALUES(%s, %s) "
+                                                                    "ON CONFLICT (iso_639_1) DO NOTHING RETURNING id", ('EN', 'English'))
 
 
 def test_keyword():
     keyword = dc.Keyword(1, 'Time travel')
-    assert keyword.get_insert_statement() == "INSERT INTO tmdb_keywords VALUES(1, $$Time travel$$) ON CONFLICT (id) DO NOTHING"
+    assert keyword.get_insert_statement() == ("INSERT INTO tmdb_keywords VALUES(%s, %s) ON CONFLICT (id) DO NOTHING",
+                                              (1, 'Time travel'))
+    assert keyword.as_row_tuple() == (1, 'Time travel')
 
 
 def test_cast():
     person = dc.Cast(1, 1, 1, 'abc123', 'John Doe/ Jane Doe/ Other', 1, 'John Doe', 1, '/path/to/profile')
-    assert person.get_insert_statement() == "INSERT INTO tmdb_cast VALUES(1, 1, 1, $$abc123$$, ARRAY[$$John Doe$$, $$Jane Doe$$, $$Other$$], 1, $$John Doe$$, 1, $$/path/to/profile$$) ON CONFLICT (id) DO NOTHING"
+    assert person.characters == ('John Doe', 'Jane Doe', 'Other')
+    assert person.characters[1] is sys.intern('Jane Doe')
+    assert dc.Cast(1, 1, 1, 'abc123', ('John Doe', 'Jane Doe', 'Other'), 1, 'John Doe', 1, '/path/to/profile') == person
+    assert dc.Cast.from_row({'cast_id': 1, 'character': 'John Doe/ Jane Doe/ Other', 'credit_id': 'abc123', 'gender': 1,
+                             'id': 1, 'name': 'John Doe', 'order': 1, 'profile_path': '/path/to/profile'},
+                            movie_id=1) == person
+    assert person.get_insert_statement() == ("INSERT INTO tmdb_cast VALUES(%s, %s, %s, %s, %s, %s, %s, %s, %s) ON CONFLICT (id) DO NOTHING",
+                                             (1, 1, 1, 'abc123', ['John Doe', 'Jane Doe', 'Other'], 1, 'John Doe', 1,
+                                              '/path/to/profile'))
+    assert person.as_row_tuple() == (1, 1, 1, 'abc123', ['John Doe', 'Jane Doe', 'Other'], 1, 'John Doe', 1,
+                                     '/path/to/profile')
 
 
 def test_crew():
     person = dc.Crew(1, 1, 'abc123', 'Admin', 1, 'Director', 'John Doe', '/path/to/profile')
-    assert person.get_insert_statement() == "INSERT INTO tmdb_crew VALUES(1, 1, $$abc123$$, $$Admin$$, 1, $$Director$$, $$John Doe$$, $$/path/to/profile$$) ON CONFLICT (id) DO NOTHING"
+    assert person.get_insert_statement() == ("INSERT INTO tmdb_crew VALUES(%s, %s, %s, %s, %s, %s, %s, %s) ON CONFLICT (id) DO NOTHING",
+                                             (1, 1, 'abc123', 'Admin', 1, 'Director', 'John Doe', '/path/to/profile'))
+    assert person.as_row_tuple() == (1, 1, 'abc123', 'Admin', 1, 'Director', 'John Doe', '/path/to/profile')
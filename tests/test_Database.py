@@ -0,0 +1,151 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import datetime
+import struct
+import threading
+
+import pytest
+import tmdb_utils.Database as db
+
+
+class FakeCursor:
+    def __init__(self, connection):
+        self.connection = connection
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def execute(self, statement, params=None):
+        if self.connection.fail_on is not None and self.connection.fail_on in statement:
+            raise Exception('statement failed')
+        self.connection.statements.append(statement)
+
+    def copy_expert(self, statement, buf):
+        self.connection.statements.append(statement)
+
+    def close(self):
+        pass
+
+
+class FakeConnection:
+    def __init__(self):
+        self.statements = []
+        self.rollbacks = 0
+        self.commits = 0
+        self.autocommit = True
+        self.fail_on = None
+
+    def cursor(self):
+        return FakeCursor(self)
+
+    def commit(self):
+        self.commits += 1
+
+    def rollback(self):
+        self.rollbacks += 1
+
+
+class FakePool:
+    def __init__(self):
+        self.connection = FakeConnection()
+        self.returned = []
+
+    def getconn(self):
+        return self.connection
+
+    def putconn(self, connection):
+        self.returned.append(connection)
+
+    def closeall(self):
+        pass
+
+
+def make_database() -> db.Database:
+    database = db.Database.__new__(db.Database)
+    database.pool = FakePool()
+    database._local = threading.local()
+    database._sessions = {}
+    return database
+
+
+def test_array_literal():
+    assert db._array_literal([1, 2, 3]) == '{1,2,3}'
+    assert db._array_literal(['John Doe', 'Say "hi"', 'C:\\path', None]) == '{"John Doe","Say \\"hi\\"","C:\\\\path",NULL}'
+
+
+def test_csv_value():
+    assert db._csv_value(None) == '\\N'
+    assert db._csv_value(['Lou']) == '{"Lou"}'
+    assert db._csv_value(42) == 42
+
+
+def test_binary_copy_payload():
+    payload = db._binary_copy_payload(('integer', 'varchar', 'varchar[]', 'date'),
+                                      [(1, 'Lou', ['Lou', None], datetime.date(2000, 1, 2)), ('2', None, [], None)])
+    assert payload == (b'PGCOPY\n\xff\r\n\x00' + struct.pack('!ii', 0, 0)
+                       + struct.pack('!h', 4)
+                       + struct.pack('!ii', 4, 1)
+                       + struct.pack('!i', 3) + b'Lou'
+                       + struct.pack('!i', 31) + struct.pack('!iiiii', 1, 1, 1043, 2, 1)
+                       + struct.pack('!i', 3) + b'Lou' + struct.pack('!i', -1)
+                       + struct.pack('!ii', 4, 1)
+                       + struct.pack('!h', 4)
+                       + struct.pack('!ii', 4, 2)
+                       + struct.pack('!i', -1)
+                       + struct.pack('!i', 12) + struct.pack('!iii', 0, 0, 1043)
+                       + struct.pack('!i', -1)
+                       + struct.pack('!h', -1))
+
+
+def test_release_clears_caches():
+    database = make_database()
+    database.lookup_cache['tmdb_languages'] = {'en': 1}
+    database.release()
+    assert database.pool.returned == [database.pool.connection]
+    assert database.pool.connection.rollbacks == 1
+    assert database.lookup_cache == {}
+
+
+def test_copy_rows_binary_rolls_back_bad_rows():
+    database = make_database()
+    assert database.copy_rows_binary('tmdb_cast', ('id', '"order"'), ('integer', 'integer'), [(1, 1), (2, '')]) is False
+    assert database.pool.connection.rollbacks == 1
+    assert not any(statement.startswith('COPY') for statement in database.pool.connection.statements)
+    assert database.copy_rows_binary('tmdb_cast', ('id',), ('integer',), [(2 ** 31,)]) is False
+
+
+def test_copy_rows_stages_in_temp_table():
+    database = make_database()
+    assert database.copy_rows('tmdb_genres', ('id', 'name'), [(1, 'Comedy')])
+    assert database.copy_rows('tmdb_genres', ('id', 'name'), [(2, 'Drama')])
+    statements = database.pool.connection.statements
+    assert statements.count("CREATE TEMP TABLE IF NOT EXISTS tmp_tmdb_genres (LIKE tmdb_genres) "
+                            "ON COMMIT DELETE ROWS") == 1
+    assert not any(statement.startswith('TRUNCATE') for statement in statements)
+
+
+def test_finalize_indexes_stops_at_failed_statement():
+    database = make_database()
+    connection = database.connection
+    connection.fail_on = 'tmdb_cast_movie_id_fkey'
+    commits = connection.commits
+    assert not database.finalize_indexes()
+    assert connection.rollbacks == 1
+    assert connection.commits == commits
+    assert not any('tmdb_crew' in statement for statement in connection.statements)
+    connection.fail_on = None
+    assert database.finalize_indexes()
+    assert connection.commits == commits + 1
+
+
+def test_set_up_tables_stops_when_create_tables_fails():
+    database = make_database()
+    connection = database.connection
+    connection.fail_on = 'CREATE TABLE IF NOT EXISTS tmdb_genres'
+    assert not database.set_up_tables()
+    assert not any('tmdb_keywords' in statement or 'ALTER TABLE' in statement
+                   for statement in connection.statements)
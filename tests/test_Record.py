@@ -1,64 +1,157 @@
+from tmdb_utils.Parsing import parse_release_date
 from tmdb_utils.Record import Record
-from typing import Any, List
+import tmdb_utils.DataClasses as dc
+import datetime
 import json
 
 
-class MockDB:
-    def __init__(self, query_result: Any, query_result_list: List[Any], return_error: str = False):
-        self.query_result = query_result
-        self.query_result_list = query_result_list
-        self.return_error = return_error
+def test_from_dict():
+    with open('test_data/test_record.json', 'r') as f:
+        raw_dict = json.load(f)
+    record = Record.from_dict(raw_dict)
+    print(record)
+    assert record is not None
+    assert record.release_date == datetime.date(2015, 2, 20)
+    assert not hasattr(record, '__dict__')
 
-    def execute_insert(self, statement: str) -> bool:
-        if self.return_error:
-            return False
-        else:
-            return True
 
-    def execute_query(self, statement: str) -> List[Any]:
-        if self.return_error:
-            return None
-        else:
-            return self.query_result_list
+def test_from_dict_iso_release_date():
+    with open('test_data/test_record.json', 'r') as f:
+        raw_dict = json.load(f)
+    raw_dict['release_date'] = '2015-02-20'
+    record = Record.from_dict(raw_dict)
+    assert record.release_date == datetime.date(2015, 2, 20)
 
-    def execute_query_for_one(self, statement: str) -> Any:
-        if self.return_error:
-            return None
-        else:
-            return self.query_result
 
+def test_from_json():
+    with open('test_data/test_record.json', 'rb') as f:
+        record = Record.from_json(f.read())
+    assert record.id == '1'
+    assert record.release_date == datetime.date(2015, 2, 20)
 
-def test_from_dict():
+
+def test_parse_release_date_is_cached():
+    assert parse_release_date('2015-02-20') == datetime.date(2015, 2, 20)
+    assert parse_release_date('2015-02-20') is parse_release_date('2015-02-20')
+    assert parse_release_date('') is None
+
+
+def test_from_dict_missing_release_date():
     with open('test_data/test_record.json', 'r') as f:
         raw_dict = json.load(f)
+    raw_dict['release_date'] = ''
     record = Record.from_dict(raw_dict)
-    print(record)
-    assert record is not None
+    assert record.release_date is None
+    assert record.as_row_tuple()[13] is None
+
+
+def test_from_dict_string_columns():
+    with open('test_data/test_record.json', 'r') as f:
+        raw_dict = json.load(f)
+    raw_dict['genres'] = '[{"id": 35, "name": "Comedy"}]'
+    raw_dict['keywords'] = "[{'id': 4379, 'name': 'time travel'}]"
+    raw_dict['crew'] = '#N/A'
+    record = Record.from_dict(raw_dict)
+    assert record.genres == [dc.Genre(35, 'Comedy')]
+    assert record.keywords == [dc.Keyword(4379, 'time travel')]
+    assert record.crew == []
+
+
+def test_parse_many():
+    with open('test_data/test_record.json', 'r') as f:
+        raw_dict = json.load(f)
+    records = Record.parse_many([raw_dict, dict(raw_dict, id='2')])
+    assert [record.id for record in records] == ['1', '2']
+    assert records[1].cast[0].movie_id == '2'
+    assert [record.id for record in Record.parse_many([raw_dict] * 3, workers=2, chunksize=1)] == ['1', '1', '1']
 
 
 def test_get_movie_insert_statement():
     with open('test_data/test_record.json', 'r') as f:
         raw_dict = json.load(f)
     record = Record.from_dict(raw_dict)
-    assert record.get_movie_insert_statement() == ("INSERT INTO tmdb_movies VALUES(1, "
-                                                   "313576, "
-                                                   "14000000, "
-                                                   "ARRAY [35], "
-                                                   "$$$$, "
-                                                   "$$tt2637294$$, "
-                                                   "en, "
-                                                   "$$Hot Tub Time Machine 2$$, "
-                                                   "$$When Lou, who has become the \"father of the Internet,\" is shot by an unknown assailant, Jacob and Nick fire up the time machine again to save their friend.$$, "
-                                                   "6.575393, "
-                                                   "$$/tQtWuwvMf0hCc2QR2tkolwl7c3c.jpg$$, "
-                                                   "ARRAY [4, 60, 8411], "
-                                                   "ARRAY [], "
-                                                   "2015-02-20, "
-                                                   "93, "
-                                                   "ARRAY [], "
-                                                   "$$Released$$, "
-                                                   "$$The Laws of Space and Time are About to be Violated.$$, "
-                                                   "$$Hot Tub Time Machine 2$$, "
-                                                   "ARRAY [4379, 9663, 11830, 179431], "
-                                                   "12314651) ON CONFLICT (id) DO NOTHING")
+    assert record.get_movie_insert_statement() == ("INSERT INTO tmdb_movies VALUES(" + ', '.join(['%s'] * 21) + ") "
+                                                   "ON CONFLICT (id) DO NOTHING",
+                                                   ('1', 313576, '14000000', [35], '', 'tt2637294', 'en',
+                                                    'Hot Tub Time Machine 2',
+                                                    "When Lou, who has become the \"father of the Internet,\" is shot by an unknown assailant, Jacob and Nick fire up the time machine again to save their friend.",
+                                                    '6.575393', '/tQtWuwvMf0hCc2QR2tkolwl7c3c.jpg', [4, 60, 8411], None,
+                                                    datetime.date(2015, 2, 20), '93', None, 'Released',
+                                                    'The Laws of Space and Time are About to be Violated.',
+                                                    'Hot Tub Time Machine 2', [4379, 9663, 11830, 179431], '12314651'))
+
+
+def test_write_many(mock_db):
+    records = []
+    for _ in range(2):
+        with open('test_data/test_record.json', 'r') as f:
+            records.append(Record.from_dict(json.load(f)))
+    database = mock_db(1, [])
+    assert Record.write_many(records, database)
+    assert len(database.written['tmdb_movies']) == 1
+    assert database.written['tmdb_movies'][0][13] == datetime.date(2015, 2, 20)
+    assert len(database.written['tmdb_cast']) == len({person.id for person in records[0].cast})
+    assert database.writers == {'tmdb_movies': 'copy', 'tmdb_collection': 'insert', 'tmdb_genres': 'insert',
+                                'tmdb_production_companies': 'insert', 'tmdb_keywords': 'insert',
+                                'tmdb_cast': 'binary', 'tmdb_crew': 'binary'}
+    assert not Record.write_many(records, mock_db(1, [], return_error=True))
+
+
+def test_get_id_is_cached(mock_db):
+    database = mock_db(7, [])
+    assert Record.get_id(dc.Country('US', 'United States of America'), database) == 7
+    assert Record.get_id(dc.Country('US', 'United States of America'), database) == 7
+    assert database.queries == 1
+    assert database.lookup_cache['tmdb_countries'] == {'US': 7}
+
+
+def test_get_ids_inserts_missing_once(mock_db):
+    database = mock_db(7, [])
+    database.lookup_cache['tmdb_languages'] = {'en': 1}
+    languages = [dc.Language('en', 'English'), dc.Language('fr', 'French'), dc.Language('fr', 'French')]
+    assert Record.get_ids(languages, database) == [1, 7, 7]
+    assert database.queries == 1
+    assert database.lookup_cache['tmdb_languages'] == {'en': 1, 'fr': 7}
 
+
+def test_failed_lookup_load_is_not_cached(mock_db):
+    database = mock_db(1, [])
+    database.load_lookup = lambda *args: None
+    language = dc.Language('en', 'English')
+    assert Record.get_id(language, database) is None
+    assert Record.get_ids([language], database) is None
+    assert database.queries == 0
+    assert database.lookup_cache == {}
+
+
+def test_failed_id_lookup_stops_writes(mock_db):
+    with open('test_data/test_record.json', 'r') as f:
+        record = Record.from_dict(json.load(f))
+    database = mock_db(1, [])
+    database.insert_lookup_rows = lambda *args: None
+    assert Record.get_ids(record.spoken_languages, database) is None
+    assert not record.write_to_postgres(database)
+    assert not Record.write_many([record], database)
+    assert database.written == {}
+
+
+def test_write_to_postgres(mock_db):
+    with open('test_data/test_record.json', 'r') as f:
+        record = Record.from_dict(json.load(f))
+    database = mock_db(1, [])
+    assert record.write_to_postgres(database)
+    assert database.written['tmdb_movies'] == [record.as_row_tuple()]
+    assert len(database.written['tmdb_cast']) == len(record.cast)
+    assert not record.write_to_postgres(mock_db(1, [], return_error=True))
+
+
+def test_movie_without_collection_writes_no_collection_row(mock_db):
+    with open('test_data/test_record.json', 'r') as f:
+        raw_dict = dict(json.load(f), belongs_to_collection='')
+    record = Record.from_dict(dict(raw_dict))
+    assert record.collections() == ()
+    database = mock_db(1, [])
+    assert record.write_to_postgres(database)
+    assert Record.write_many([record], database)
+    assert database.written['tmdb_collection'] == []
+    assert [row[1] for row in database.written['tmdb_movies']] == [None, None]
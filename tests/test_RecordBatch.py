@@ -0,0 +1,56 @@
+from tmdb_utils.Record import Record
+from tmdb_utils.RecordBatch import RecordBatch
+import json
+
+
+def test_extend_from_dict():
+    batch = RecordBatch()
+    for movie_id in ('1', '2'):
+        with open('test_data/test_record.json', 'r') as f:
+            batch.extend_from_dict(dict(json.load(f), id=movie_id))
+    assert len(batch) == 2
+    assert batch.titles == ['Hot Tub Time Machine 2', 'Hot Tub Time Machine 2']
+    assert len(batch.elements['tmdb_genres'][2]) == 1
+
+
+def test_write_to_postgres(mock_db):
+    with open('test_data/test_record.json', 'r') as f:
+        raw_dict = json.load(f)
+    batch = RecordBatch()
+    batch.extend_from_dict(dict(raw_dict))
+    database = mock_db(1, [])
+    assert batch.write_to_postgres(database)
+    record = Record.from_dict(raw_dict)
+    for language in record.spoken_languages:
+        language.id = 1
+    for country in record.production_countries:
+        country.id = 1
+    assert database.written['tmdb_movies'] == [record.as_row_tuple()]
+    assert len(database.written['tmdb_cast']) == len({person.id for person in record.cast})
+    assert database.writers['tmdb_movies'] == 'copy'
+    assert database.writers['tmdb_crew'] == 'binary'
+    assert database.writers['tmdb_genres'] == 'insert'
+    assert not batch.write_to_postgres(mock_db(1, [], return_error=True))
+
+
+def test_write_to_postgres_failed_id_lookup(mock_db):
+    with open('test_data/test_record.json', 'r') as f:
+        raw_dict = json.load(f)
+    batch = RecordBatch()
+    batch.extend_from_dict(raw_dict)
+    database = mock_db(1, [])
+    database.insert_lookup_rows = lambda *args: None
+    assert batch.movie_rows(database) is None
+    assert not batch.write_to_postgres(database)
+    assert database.written == {}
+
+
+def test_write_to_postgres_without_collection(mock_db):
+    with open('test_data/test_record.json', 'r') as f:
+        raw_dict = dict(json.load(f), belongs_to_collection='')
+    batch = RecordBatch()
+    batch.extend_from_dict(raw_dict)
+    database = mock_db(1, [])
+    assert batch.write_to_postgres(database)
+    assert database.written['tmdb_collection'] == []
+    assert database.written['tmdb_movies'][0][1] is None